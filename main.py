@@ -4,220 +4,304 @@ Blackjack Probability Calculator
 Calculates advice on whether to hit or stand based on probabilities.
 """
 
+import re
 import sys
-from collections import Counter
+import threading
+from collections import OrderedDict, namedtuple
 from functools import lru_cache
 
 try:
-    from flask import Flask, request, render_template_string
+    from flask import Flask, request
     FLASK_AVAILABLE = True
 except ImportError:
     FLASK_AVAILABLE = False
 
-# Card ranks and their values
+# Card ranks
 RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
 SUITS = ['♥', '♣', '♠', '♦']
 NUMBERS = ['2', '3', '4', '5', '6', '7', '8', '9', '10']
 FIGURES = ['J', 'Q', 'K']
 ACES = ['A']
-VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11}
+# One whitespace-separated played card: rank with an optional suit, e.g. 10♥ or K
+_CARD_RE = re.compile(r'(?<!\S)(10|[2-9JQKA])[♥♣♠♦]?(?!\S)')
+
+# Rank buckets used by the probability math: 2-9, all ten-valued cards, ace.
+# 10, J, Q and K are interchangeable for hand values, so they share a bucket.
+# Cards are converted to bucket indices at input and handled as such internally;
+# BUCKET_LABELS holds the display names of the buckets.
+BUCKET_LABELS = ('2', '3', '4', '5', '6', '7', '8', '9', '10/J/Q/K', 'A')
+VALUES_ARR = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+TEN_IDX = 8
+ACE_IDX = 9
+RANK_IDX = {rank: idx for idx, rank in enumerate(NUMBERS)}
+RANK_IDX.update({rank: TEN_IDX for rank in FIGURES})
+RANK_IDX.update({rank: ACE_IDX for rank in ACES})
+
+# Dealer's final outcomes, in the order used by dealer probability tuples
+DEALER_OUTCOMES = ('bust', 17, 18, 19, 20, 21)
+BUST_SLOT = 0
+
+# Player's result for standing on each value 0-21 against every dealer outcome:
+# 1 win, 0 push, -1 lose
+OUTCOME_TABLE = tuple(
+    tuple(1 if d_val == 'bust' or d_val < player_value else 0 if d_val == player_value else -1
+          for d_val in DEALER_OUTCOMES)
+    for player_value in range(22)
+)
 
 # Number of decks
 NUM_DECKS = 6
 
-# Global state for card counting
+# Cards per rank bucket in a full shoe
+FULL_SHOE = tuple((16 if idx == TEN_IDX else 4) * NUM_DECKS for idx in range(len(VALUES_ARR)))
+
+# Global state for card counting; remaining_global holds cards per rank bucket
 history = []
-remaining_global = Counter()
-for rank in RANKS:
-    remaining_global[rank] = 4 * NUM_DECKS
+remaining_global = list(FULL_SHOE)
 
-def calculate_hand_value(cards):
+def _hand_state(cards):
     """
-    Calculate the best possible hand value for blackjack.
-    Aces can be 1 or 11.
+    Calculate (value, soft) of a hand, soft is 1 if an ace is counted as 11.
+    cards: rank bucket indices
     """
-    value = 0
-    aces = 0
-    for card in cards:
-        if card == 'A':
-            aces += 1
-            value += 11
-        else:
-            value += VALUES[card]
-
-    # Adjust for aces
-    while value > 21 and aces > 0:
-        value -= 10
-        aces -= 1
+    # Count every ace as 1; a second ace as 11 would always bust, so at most
+    # one of them can be raised to 11
+    hard_value = sum(VALUES_ARR[idx] for idx in cards) - 10 * cards.count(ACE_IDX)
+    soft = int(ACE_IDX in cards and hard_value <= 11)
+    return hard_value + 10 * soft, soft
 
-    return value
-
-def get_remaining_cards(dealer_card, player_cards, remaining_global):
+def get_remaining_cards(dealer_idx, player_idx, counts):
     """
     Calculate remaining cards after removing dealer's visible card and player's cards from global remaining.
-    Returns a Counter of remaining ranks.
+    Takes and returns tuples of counts per rank bucket.
     """
-    remaining = remaining_global.copy()
+    remaining = list(counts)
 
     # Remove dealer's card
-    remaining[dealer_card] -= 1
+    remaining[dealer_idx] -= 1
 
     # Remove player's cards
-    for card in player_cards:
-        remaining[card] -= 1
+    for idx in player_idx:
+        remaining[idx] -= 1
 
-    return remaining
+    return tuple(remaining)
 
-def calculate_bust_probability(current_value, remaining_cards):
+def calculate_bust_probability(current_value, soft, draw_probs):
     """
     Calculate probability of busting when hitting from current hand value.
     """
-    total_remaining = sum(remaining_cards.values())
-    if total_remaining == 0:
-        return 0.0
+    return sum(p for p, state in zip(draw_probs, _TRANSITIONS[(current_value, soft)]) if state is None)
 
-    bust_count = 0
-    for rank, count in remaining_cards.items():
-        new_value = current_value + VALUES[rank]
-        if new_value > 21:
-            bust_count += count
+def _draw_probabilities(counts):
+    """
+    Probability of drawing each rank bucket from a shoe with the given counts.
+    """
+    total = sum(counts)
+    if total == 0:
+        return (0.0,) * len(counts)
+    return tuple(count / total for count in counts)
 
-    return bust_count / total_remaining
+def _next_state(value, soft, idx):
+    """
+    Hand state (value, soft) after drawing a card from bucket idx, or None on bust.
+    soft is 1 if an ace is currently counted as 11.
+    """
+    if idx == ACE_IDX:
+        if value + 11 <= 21:
+            return (value + 11, 1)
+        new_value = value + 1
+    else:
+        new_value = value + VALUES_ARR[idx]
+    if new_value > 21 and soft:
+        new_value -= 10
+        soft = 0
+    if new_value > 21:
+        return None
+    return (new_value, soft)
+
+# Order in which the dealer table is filled, so that every state's successors
+# are already known: hard 21-12 only draw into higher hard totals, soft hands
+# draw into higher soft totals or fall back to hard 12+, and hard 11-2 may
+# still draw into a soft total via an ace.
+_DEALER_STATES = ([(v, 0) for v in range(21, 11, -1)] +
+                  [(v, 1) for v in range(21, 10, -1)] +
+                  [(v, 0) for v in range(11, 1, -1)])
+
+# Successor state for every hand state (value 0-21, soft or hard) and drawn
+# bucket, independent of the shoe
+_TRANSITIONS = {
+    (value, soft): tuple(_next_state(value, soft, i) for i in range(len(VALUES_ARR)))
+    for value in range(22) for soft in (0, 1)
+}
+
+def _dealer_table(draw_probs):
+    """
+    Bottom-up table of dealer probabilities.
+    draw_probs: probability of drawing each rank bucket
+    Returns dict {(value, soft): probs} where probs is a tuple ordered as
+    DEALER_OUTCOMES.
+
+    Every dealer card is drawn with the same probabilities, i.e. with
+    replacement. After k dealer draws the exact probability of a bucket
+    differs by at most k / (total - k); for a dealer hand of a handful of
+    cards out of a 6-deck shoe that is well under one percent.
+    """
+    table = {}
+    for state in _DEALER_STATES:
+        value = state[0]
+        probs = [0.0] * len(DEALER_OUTCOMES)
+        if value >= 17:
+            probs[value - 16] = 1.0
+        else:
+            for p, next_state in zip(draw_probs, _TRANSITIONS[state]):
+                if p == 0:
+                    continue
+                if next_state is None:
+                    probs[BUST_SLOT] += p
+                    continue
+                sub_probs = table[next_state]
+                for k in range(len(probs)):
+                    probs[k] += sub_probs[k] * p
+        table[state] = tuple(probs)
+    return table
+
+def _upcard_probs(draw_probs):
+    """
+    Dealer probabilities for every possible upcard, indexed by rank bucket.
+    """
+    table = _dealer_table(draw_probs)
+    return tuple(table[(VALUES_ARR[i], int(i == ACE_IDX))] for i in range(len(VALUES_ARR)))
 
-@lru_cache(maxsize=None)
-def _dealer_probs_recursive(hand_tuple, rem_tuple):
+@lru_cache(maxsize=256)
+def _upcard_probs_for_counts(counts):
     """
-    Recursive helper for dealer probabilities.
-    hand_tuple: tuple of cards
-    rem_tuple: tuple of (rank, count) sorted
+    Cached _upcard_probs for a shoe.
+    counts: tuple of cards per rank bucket left in the shoe, before the
+    dealer's and player's cards are removed, so all hands dealt from one shoe
+    share an entry. The shoe changes only when played cards are recorded and
+    older shoes are not queried again, so 256 entries are plenty.
     """
-    hand = list(hand_tuple)
-    rem_cards = Counter(dict(rem_tuple))
-    value = calculate_hand_value(hand)
-    if value > 21:
-        return (('bust', 1.0),)
-    if value >= 17:
-        return ((value, 1.0),)
-    
-    total = sum(rem_cards.values())
-    if total == 0:
-        return ((value, 1.0),)
-    
-    probs = Counter()
-    for rank, count in rem_cards.items():
-        if count == 0:
-            continue
-        new_hand = hand + [rank]
-        new_rem = rem_cards.copy()
-        new_rem[rank] -= 1
-        new_rem_tuple = tuple(sorted(new_rem.items()))
-        sub_probs = _dealer_probs_recursive(tuple(new_hand), new_rem_tuple)
-        for k, p in sub_probs:
-            probs[k] += p * (count / total)
-    return tuple(probs.items())
-
-def calculate_dealer_probabilities(dealer_card, remaining_cards):
+    return _upcard_probs(_draw_probabilities(counts))
+
+# Warm the cache with the full shoe so the first advice does not pay for it
+_upcard_probs_for_counts(FULL_SHOE)
+
+def calculate_dealer_probabilities(dealer_idx, shoe_counts):
     """
     Calculate probability distribution of dealer's final hand value.
-    Returns dict {value: prob} where value is 17-21 or 'bust'
+    dealer_idx: rank bucket of the dealer's visible card
+    shoe_counts: tuple of cards per rank bucket left in the shoe. The dealer's
+    and player's cards on the table are not removed, so every hand dealt from
+    the same shoe shares one cached table.
+    Returns a tuple of probabilities ordered as DEALER_OUTCOMES
+    (bust, 17, 18, 19, 20, 21).
     """
-    rem_tuple = tuple(sorted(remaining_cards.items()))
-    probs_tuple = _dealer_probs_recursive((dealer_card,), rem_tuple)
-    return dict(probs_tuple)
+    return _upcard_probs_for_counts(shoe_counts)[dealer_idx]
 
 def calculate_ev_stand(player_value, dealer_probs):
     """
     Calculate expected value if player stands.
     """
-    ev = 0
-    for d_val, prob in dealer_probs.items():
-        if d_val == 'bust':
-            ev += prob * 1  # win
-        elif isinstance(d_val, int):
-            if d_val > player_value:
-                ev += prob * (-1)  # lose
-            elif d_val < player_value:
-                ev += prob * 1  # win
-            else:
-                ev += prob * 0  # push
-    return ev
-
-def calculate_ev_hit(player_cards, remaining, dealer_probs):
+    return sum(p * outcome for p, outcome in zip(dealer_probs, OUTCOME_TABLE[player_value]))
+
+def calculate_stand_evs(dealer_probs):
+    """
+    Calculate expected value of standing for every player value 0-21.
+    """
+    return tuple(calculate_ev_stand(player_value, dealer_probs) for player_value in range(len(OUTCOME_TABLE)))
+
+def calculate_ev_hit(player_value, soft, draw_probs, stand_evs):
     """
     Calculate expected value if player hits.
+    stand_evs: stand EV per player value, see calculate_stand_evs. It is
+    computed once for the shoe before the hit and shared by every drawn card;
+    removing one card shifts the dealer probabilities by well under a percent.
     """
-    total = sum(remaining.values())
-    if total == 0:
+    if not any(draw_probs):
         return -1  # assume bust
-    
-    ev = 0
-    for rank, count in remaining.items():
-        if count == 0:
-            continue
-        new_cards = player_cards + [rank]
-        new_value = calculate_hand_value(new_cards)
-        if new_value > 21:
-            outcome = -1
-        else:
-            outcome = calculate_ev_stand(new_value, dealer_probs)
-        ev += outcome * (count / total)
-    return ev
 
-def calculate_ev_double(player_cards, remaining, dealer_probs):
+    return sum(p * (-1 if state is None else stand_evs[state[0]])
+               for p, state in zip(draw_probs, _TRANSITIONS[(player_value, soft)]))
+
+def calculate_ev_double(player_value, soft, draw_probs, stand_evs):
     """
     Calculate expected value if player doubles down (hits once, doubles bet).
+    stand_evs: as in calculate_ev_hit
     """
-    total = sum(remaining.values())
-    if total == 0:
-        return -2  # bust with double bet
-    
-    ev = 0
-    for rank, count in remaining.items():
-        if count == 0:
-            continue
-        new_cards = player_cards + [rank]
-        new_value = calculate_hand_value(new_cards)
-        if new_value > 21:
-            outcome = -2  # double bet lose
-        else:
-            outcome = 2 * calculate_ev_stand(new_value, dealer_probs)  # double bet
-        ev += outcome * (count / total)
-    return ev
-
-def get_advice(dealer_card, player_cards, remaining_global, can_double=False):
+    return 2 * calculate_ev_hit(player_value, soft, draw_probs, stand_evs)  # double bet
+
+# Numbers behind one piece of advice; ev_hit and ev_double are None when skipped
+AdviceResult = namedtuple('AdviceResult', ['player_value', 'bust_prob', 'dealer_bust_prob',
+                                           'ev_stand', 'ev_hit', 'ev_double', 'advice'])
+
+# Advice text, one template for each combination of evaluated hit and double EVs
+_ADVICE_HEAD = ("Wartość ręki gracza: {player_value}\n"
+                "Prawdopodobieństwo przekroczenia przy doborze: {bust_prob:.2%}\n"
+                "Prawdopodobieństwo przekroczenia krupiera: {dealer_bust_prob:.2%}\n"
+                "Oczekiwana wartość stania: {ev_stand:.3f}\n")
+_ADVICE_FMTS = {
+    (has_hit, has_double): (_ADVICE_HEAD +
+                            ("Oczekiwana wartość doboru: {ev_hit:.3f}\n" if has_hit else "") +
+                            ("Oczekiwana wartość podwojenia: {ev_double:.3f}\n" if has_double else "") +
+                            "Porada: {advice}")
+    for has_hit in (False, True) for has_double in (False, True)
+}
+
+@lru_cache(maxsize=4096)
+def _advice_core(dealer_idx, player_idx, shoe_counts, can_double):
     """
-    Get advice on whether to hit, stand, or double.
+    Compute the advice for a hand.
+    dealer_idx: rank bucket of the dealer's visible card
+    player_idx: sorted tuple of the player's rank buckets
+    shoe_counts: tuple of cards per rank bucket left in the shoe, before
+    removing the dealer's and player's cards
+    Returns an AdviceResult, or None if the player has already busted.
+    The result is cached, so it must depend on nothing but the arguments.
     """
-    player_value = calculate_hand_value(player_cards)
+    player_value, soft = _hand_state(player_idx)
     if player_value > 21:
-        return "Już przekroczyłeś!"
-
-    remaining = get_remaining_cards(dealer_card, player_cards, remaining_global)
-    dealer_probs = calculate_dealer_probabilities(dealer_card, remaining)
-
-    ev_stand = calculate_ev_stand(player_value, dealer_probs)
-    ev_hit = calculate_ev_hit(player_cards, remaining, dealer_probs)
-
-    options = [('Stój', ev_stand), ('Dobierz', ev_hit)]
-    if can_double:
-        ev_double = calculate_ev_double(player_cards, remaining, dealer_probs)
+        return None
+
+    dealer_probs = calculate_dealer_probabilities(dealer_idx, shoe_counts)
+    draw_probs = _draw_probabilities(get_remaining_cards(dealer_idx, player_idx, shoe_counts))
+
+    stand_evs = calculate_stand_evs(dealer_probs)
+    ev_stand = stand_evs[player_value]
+    dealer_bust_prob = dealer_probs[BUST_SLOT]
+    options = [('Stój', ev_stand)]
+    ev_hit = ev_double = None
+
+    if player_value <= 11 and any(draw_probs):
+        # No single card busts 11 or less, so hitting beats standing unless
+        # the shoe is empty
+        bust_prob = 0.0
+        options = []
+    else:
+        bust_prob = calculate_bust_probability(player_value, soft, draw_probs)
+    # Winning every non-busting draw bounds the EV of hitting from above
+    ev_hit_bound = 1 - 2 * bust_prob
+    if ev_hit_bound >= ev_stand:
+        ev_hit = calculate_ev_hit(player_value, soft, draw_probs, stand_evs)
+        options.append(('Dobierz', ev_hit))
+    if can_double and 2 * ev_hit_bound >= ev_stand:
+        ev_double = calculate_ev_double(player_value, soft, draw_probs, stand_evs)
         options.append(('Podwój', ev_double))
 
     best = max(options, key=lambda x: x[1])
-    advice = best[0]
+    return AdviceResult(player_value, bust_prob, dealer_bust_prob, ev_stand, ev_hit, ev_double, best[0])
 
-    bust_prob = calculate_bust_probability(player_value, remaining)
-    dealer_bust_prob = dealer_probs.get('bust', 0)
+def get_advice(dealer_card, player_cards, remaining_global, can_double=False):
+    """
+    Get advice on whether to hit, stand, or double.
+    remaining_global: cards per rank bucket left in the shoe
+    """
+    player_idx = tuple(sorted(RANK_IDX[card] for card in player_cards))
+    res = _advice_core(RANK_IDX[dealer_card], player_idx, tuple(remaining_global), bool(can_double))
+    if res is None:
+        return "Już przekroczyłeś!"
 
-    result = (f"Wartość ręki gracza: {player_value}\n"
-              f"Prawdopodobieństwo przekroczenia przy doborze: {bust_prob:.2%}\n"
-              f"Prawdopodobieństwo przekroczenia krupiera: {dealer_bust_prob:.2%}\n"
-              f"Oczekiwana wartość stania: {ev_stand:.3f}\n"
-              f"Oczekiwana wartość doboru: {ev_hit:.3f}\n")
-    if can_double:
-        result += f"Oczekiwana wartość podwojenia: {ev_double:.3f}\n"
-    result += f"Porada: {advice}"
-    return result
+    fmt = _ADVICE_FMTS[(res.ev_hit is not None, res.ev_double is not None)]
+    return fmt.format_map(res._asdict())
 
 def main():
     print("Blackjack Probability Calculator")
@@ -236,12 +320,12 @@ def main():
             sys.exit(1)
         player_cards.append(card)
 
-    advice = get_advice(dealer_card, player_cards)
+    advice = get_advice(dealer_card, player_cards, remaining_global)
     print(advice)
 
 def test():
     """Test function with sample scenarios."""
-    full_remaining = Counter({rank: 4 * NUM_DECKS for rank in RANKS})
+    full_remaining = FULL_SHOE
     print("Testing scenarios:")
 
     # Test 1: Dealer 10, Player A 6 (soft 17)
@@ -259,6 +343,131 @@ def test():
 if FLASK_AVAILABLE:
     app = Flask(__name__)
 
+    INDEX_HTML = """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>Kalkulator Prawdopodobieństwa w Blackjacku</title>
+        <style>
+            body { font-family: Arial, sans-serif; margin: 40px; background-color: #f4f4f4; }
+            h1 { color: #333; }
+            form { margin-bottom: 20px; background-color: white; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
+            label { display: inline-block; margin: 2px; font-weight: bold; font-size: 14px; }
+            input[type="checkbox"] { margin-right: 3px; }
+            .card-group { margin-bottom: 15px; }
+            .suit-group { display: inline-block; vertical-align: top; margin-right: 20px; }
+            .suit-group strong { display: block; margin-bottom: 5px; font-size: 16px; }
+            button { padding: 10px 20px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 16px; margin-right: 10px; }
+            button:hover { background-color: #45a049; }
+            .advice { margin-top: 20px; padding: 20px; background-color: white; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
+            .advice h2 { color: #333; }
+            .history { margin-top: 20px; padding: 20px; background-color: #e8f5e8; border-radius: 8px; }
+            hr { border: none; height: 1px; background-color: #ccc; margin: 30px 0; }
+        </style>
+    </head>
+    <body>
+        <h1>Kalkulator Prawdopodobieństwa w Blackjacku</h1>
+        <form method="post" id="advice-form">
+            <div class="card-group">
+                <label>Widoczna karta krupiera:</label><br>
+                {% for suit in suits %}
+                <div class="suit-group">
+                    <strong>{{ suit }}</strong>
+                    {% for rank in ranks %}
+                    <label><input type="checkbox" name="dealer_card" value="{{ rank }}" {% if rank in dealer_selected %}checked{% endif %}> {{ rank }}</label>
+                    {% endfor %}
+                </div>
+                {% endfor %}
+            </div>
+            <div class="card-group">
+                <label>Karty gracza (zaznacz wszystkie):</label><br>
+                {% for suit in suits %}
+                <div class="suit-group">
+                    <strong>{{ suit }}</strong>
+                    {% for rank in ranks %}
+                    <label><input type="checkbox" name="player_cards" value="{{ rank }}" {% if rank in player_selected %}checked{% endif %}> {{ rank }}</label>
+                    {% endfor %}
+                </div>
+                {% endfor %}
+            </div>
+            <label><input type="checkbox" name="can_double" {% if can_double_checked %}checked{% endif %}> Czy możesz podwoić stawkę?</label><br>
+            <button type="submit" name="get_advice">Uzyskaj poradę</button>
+            <button type="button" id="clear-btn">Wyczyść zaznaczenia</button>
+        </form>
+        {% if advice %}
+        <div class="advice">
+            <h2>Porada:</h2>
+            {{ advice | safe }}
+        </div>
+        {% endif %}
+        <hr>
+        <div class="history">
+            <h2>Historia gry (liczenie kart)</h2>
+            <form method="post">
+                <label>Karty zagrane (oddzielone spacją):</label>
+                <input type="text" name="played_cards" placeholder="np. 10 J 5"><br>
+                <button type="submit" name="add_history">Dodaj do historii</button>
+            </form>
+            {% if history %}
+            <p><strong>Zagrane karty:</strong> {{ history | join(' ') }}</p>
+            <p><strong>Pozostałe karty:</strong> {% for label, count in remaining %}{{ label }}:{{ count }} {% endfor %}</p>
+            {% endif %}
+        </div>
+        <script>
+            document.addEventListener('DOMContentLoaded', function() {
+                // Make dealer checkboxes exclusive
+                const dealerCheckboxes = document.querySelectorAll('input[name="dealer_card"]');
+                dealerCheckboxes.forEach(cb => {
+                    cb.addEventListener('change', function() {
+                        if (this.checked) {
+                            dealerCheckboxes.forEach(other => {
+                                if (other !== this) other.checked = false;
+                            });
+                        }
+                    });
+                });
+                // Clear button
+                document.getElementById('clear-btn').addEventListener('click', function() {
+                    const allCheckboxes = document.querySelectorAll('#advice-form input[type="checkbox"]');
+                    allCheckboxes.forEach(cb => cb.checked = false);
+                });
+            });
+        </script>
+    </body>
+    </html>
+    """
+    # Compiled once instead of on every request
+    INDEX_TEMPLATE = app.jinja_env.from_string(INDEX_HTML)
+
+    # Advice already rendered for the page, keyed by the canonical input and
+    # ordered from least to most recently used
+    ADVICE_CACHE_SIZE = 128
+    _LAST_ADVICE = OrderedDict()
+    _LAST_ADVICE_LOCK = threading.Lock()
+
+    def _advice_html(dealer_card, player_cards, can_double):
+        """
+        Get advice formatted for the page, reusing it for repeated inputs.
+        """
+        # One snapshot of the shoe for both the key and the advice, so a
+        # concurrent history update cannot store new advice under an old key
+        shoe = tuple(remaining_global)
+        key = (RANK_IDX[dealer_card], tuple(sorted(RANK_IDX[card] for card in player_cards)),
+               shoe, can_double)
+        with _LAST_ADVICE_LOCK:
+            advice = _LAST_ADVICE.get(key)
+            if advice is not None:
+                _LAST_ADVICE.move_to_end(key)
+                return advice
+
+        # Computed outside the lock; concurrent misses on a key store the same text
+        advice = get_advice(dealer_card, player_cards, shoe, can_double).replace('\n', '<br>')
+        with _LAST_ADVICE_LOCK:
+            _LAST_ADVICE[key] = advice
+            if len(_LAST_ADVICE) > ADVICE_CACHE_SIZE:
+                _LAST_ADVICE.popitem(last=False)
+        return advice
+
     @app.route('/', methods=['GET', 'POST'])
     def index():
         advice = ""
@@ -272,7 +481,7 @@ if FLASK_AVAILABLE:
             if 'get_advice' in request.form and (dealer_selected or player_selected):
                 if len(dealer_selected) == 1 and dealer_selected[0] in RANKS and all(c in RANKS for c in player_selected):
                     dealer_card = dealer_selected[0]
-                    advice = get_advice(dealer_card, player_selected, remaining_global, can_double_checked).replace('\n', '<br>')
+                    advice = _advice_html(dealer_card, player_selected, can_double_checked)
                     # Clear selections after advice
                     dealer_selected = []
                     player_selected = []
@@ -281,113 +490,15 @@ if FLASK_AVAILABLE:
                     advice = "Nieprawidłowe dane. Wybierz dokładnie jedną kartę krupiera i zaznacz karty gracza."
             if 'add_history' in request.form:
                 played_str = request.form.get('played_cards', '').strip().upper()
-                played = []
-                for c in played_str.split():
-                    if len(c) >= 2 and c[0] in RANKS and c[1] in SUITS:
-                        played.append(c[0])
-                    elif c in RANKS:
-                        played.append(c)
+                played = _CARD_RE.findall(played_str)
                 if played:
                     history.extend(played)
                     for c in played:
-                        remaining_global[c] -= 1
+                        remaining_global[RANK_IDX[c]] -= 1
                 else:
                     advice = "Nieprawidłowe karty dla historii."
         
-        html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Kalkulator Prawdopodobieństwa w Blackjacku</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 40px; background-color: #f4f4f4; }
-                h1 { color: #333; }
-                form { margin-bottom: 20px; background-color: white; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
-                label { display: inline-block; margin: 2px; font-weight: bold; font-size: 14px; }
-                input[type="checkbox"] { margin-right: 3px; }
-                .card-group { margin-bottom: 15px; }
-                .suit-group { display: inline-block; vertical-align: top; margin-right: 20px; }
-                .suit-group strong { display: block; margin-bottom: 5px; font-size: 16px; }
-                button { padding: 10px 20px; background-color: #4CAF50; color: white; border: none; border-radius: 4px; cursor: pointer; font-size: 16px; margin-right: 10px; }
-                button:hover { background-color: #45a049; }
-                .advice { margin-top: 20px; padding: 20px; background-color: white; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1); }
-                .advice h2 { color: #333; }
-                .history { margin-top: 20px; padding: 20px; background-color: #e8f5e8; border-radius: 8px; }
-                hr { border: none; height: 1px; background-color: #ccc; margin: 30px 0; }
-            </style>
-        </head>
-        <body>
-            <h1>Kalkulator Prawdopodobieństwa w Blackjacku</h1>
-            <form method="post" id="advice-form">
-                <div class="card-group">
-                    <label>Widoczna karta krupiera:</label><br>
-                    {% for suit in suits %}
-                    <div class="suit-group">
-                        <strong>{{ suit }}</strong>
-                        {% for rank in ranks %}
-                        <label><input type="checkbox" name="dealer_card" value="{{ rank }}" {% if rank in dealer_selected %}checked{% endif %}> {{ rank }}</label>
-                        {% endfor %}
-                    </div>
-                    {% endfor %}
-                </div>
-                <div class="card-group">
-                    <label>Karty gracza (zaznacz wszystkie):</label><br>
-                    {% for suit in suits %}
-                    <div class="suit-group">
-                        <strong>{{ suit }}</strong>
-                        {% for rank in ranks %}
-                        <label><input type="checkbox" name="player_cards" value="{{ rank }}" {% if rank in player_selected %}checked{% endif %}> {{ rank }}</label>
-                        {% endfor %}
-                    </div>
-                    {% endfor %}
-                </div>
-                <label><input type="checkbox" name="can_double" {% if can_double_checked %}checked{% endif %}> Czy możesz podwoić stawkę?</label><br>
-                <button type="submit" name="get_advice">Uzyskaj poradę</button>
-                <button type="button" id="clear-btn">Wyczyść zaznaczenia</button>
-            </form>
-            {% if advice %}
-            <div class="advice">
-                <h2>Porada:</h2>
-                {{ advice | safe }}
-            </div>
-            {% endif %}
-            <hr>
-            <div class="history">
-                <h2>Historia gry (liczenie kart)</h2>
-                <form method="post">
-                    <label>Karty zagrane (oddzielone spacją):</label>
-                    <input type="text" name="played_cards" placeholder="np. 10 J 5"><br>
-                    <button type="submit" name="add_history">Dodaj do historii</button>
-                </form>
-                {% if history %}
-                <p><strong>Zagrane karty:</strong> {{ history | join(' ') }}</p>
-                <p><strong>Pozostałe karty:</strong> {% for rank, count in remaining_global.items() %}{{ rank }}:{{ count }} {% endfor %}</p>
-                {% endif %}
-            </div>
-            <script>
-                document.addEventListener('DOMContentLoaded', function() {
-                    // Make dealer checkboxes exclusive
-                    const dealerCheckboxes = document.querySelectorAll('input[name="dealer_card"]');
-                    dealerCheckboxes.forEach(cb => {
-                        cb.addEventListener('change', function() {
-                            if (this.checked) {
-                                dealerCheckboxes.forEach(other => {
-                                    if (other !== this) other.checked = false;
-                                });
-                            }
-                        });
-                    });
-                    // Clear button
-                    document.getElementById('clear-btn').addEventListener('click', function() {
-                        const allCheckboxes = document.querySelectorAll('#advice-form input[type="checkbox"]');
-                        allCheckboxes.forEach(cb => cb.checked = false);
-                    });
-                });
-            </script>
-        </body>
-        </html>
-        """
-        return render_template_string(html, suits=SUITS, ranks=RANKS, advice=advice, history=history, remaining_global=remaining_global, dealer_selected=dealer_selected, player_selected=player_selected, can_double_checked=can_double_checked)
+        return INDEX_TEMPLATE.render(suits=SUITS, ranks=RANKS, advice=advice, history=history, remaining=zip(BUCKET_LABELS, remaining_global), dealer_selected=dealer_selected, player_selected=player_selected, can_double_checked=can_double_checked)
 
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "web":